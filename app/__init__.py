@@ -2,10 +2,33 @@ from flask import Flask
 from flask_cors import CORS
 import os
 import sys
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from concurrent.futures import ThreadPoolExecutor
+
+def _configure_logging():
+    """Send application logs through a queue so handler I/O happens off the request thread"""
+    app_logger = logging.getLogger('app')
+    app_logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+    if any(isinstance(h, QueueHandler) for h in app_logger.handlers):
+        return
+    
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s [%(name)s] %(message)s'))
+    listener = QueueListener(log_queue, stream_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    
+    app_logger.addHandler(QueueHandler(log_queue))
 
 def create_app():
     app = Flask(__name__)
     CORS(app)
+    _configure_logging()
 
     # Add project root to the Python path to allow for absolute imports
     project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
@@ -15,10 +38,36 @@ def create_app():
     # Configuration
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key')
     app.config['PULLED_CODE_DIR'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'PulledCode')
+    app.config['MIRROR_CACHE_DIR'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'MirrorCache')
+    app.config['MIRROR_CACHE_MAX_BYTES'] = int(os.environ.get('MIRROR_CACHE_MAX_BYTES', 5 * 1024 ** 3))
     app.config['DATA_DIR'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+    app.config['SCAN_CACHE_DIR'] = os.path.join(app.config['DATA_DIR'], 'scan_cache')
+    app.config['SCAN_CACHE_MAX_BYTES'] = int(os.environ.get('SCAN_CACHE_MAX_BYTES', 2 * 1024 ** 3))
     app.config['TEMPLATES_DIR'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates')
+    app.config['GEMINI_TIMEOUT'] = float(os.environ.get('GEMINI_TIMEOUT', 30))
+    # Deadline for a whole streamed report, which takes far longer than a single response
+    app.config['GEMINI_STREAM_TIMEOUT'] = float(os.environ.get('GEMINI_STREAM_TIMEOUT', 600))
     # Exclude heavy or generated folders from Flask's file-watcher (watchdog) to avoid unnecessary reloads
-    app.config['WATCHDOG_EXCLUDE_PATTERNS'] = ['*/analysis_engine/*', '*/PulledCode/*']
+    app.config['WATCHDOG_EXCLUDE_PATTERNS'] = ['*/analysis_engine/*', '*/PulledCode/*', '*/MirrorCache/*']
+    
+    # Active analysis plan, shared by all requests in this process (in production, use database)
+    app.config['CURRENT_PLAN'] = 'basic'
+    app.extensions['plan_lock'] = threading.Lock()
+    
+    # Background workers for /api/analyze and the status of the scans they run
+    app.config['ANALYSIS_WORKERS'] = int(os.environ.get('ANALYSIS_WORKERS', 2))
+    app.extensions['analysis_executor'] = ThreadPoolExecutor(
+        max_workers=app.config['ANALYSIS_WORKERS'], thread_name_prefix='analysis'
+    )
+    app.extensions['scan_jobs'] = {}
+    # Finished jobs are dropped from scan_jobs after this many seconds; their saved results remain
+    app.config['SCAN_JOB_TTL'] = int(os.environ.get('SCAN_JOB_TTL', 3600))
+    # Scans that share a clone directory (and so its mirror) take turns, one lock per directory
+    app.extensions['clone_locks'] = {}
+    app.extensions['clone_locks_lock'] = threading.Lock()
+    # One AnalysisService per plan, built on first use so the analyzer is loaded once
+    app.extensions['analysis_services'] = {}
+    app.extensions['analysis_services_lock'] = threading.Lock()
     
     # Register blueprints
     from app.routes.main import main_bp
@@ -1,20 +1,21 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, send_file, current_app
 from app.services.github_service import GitHubService
-from app.services.analysis_service import AnalysisService
+from app.services.analysis_service import AnalysisService, scan_cache_key
 from app.services.report_service import ReportService
 import os
 import json
+import time
+import threading
+import uuid
+import logging
 
-main_bp = Blueprint('main', __name__)
+logger = logging.getLogger(__name__)
 
-# Global variable to store current plan (in production, use database)
-CURRENT_PLAN = 'basic'  # Default plan
+main_bp = Blueprint('main', __name__)
 
 @main_bp.route('/api/change-plan', methods=['POST'])
 def change_plan():
     """Change analysis plan configuration"""
-    global CURRENT_PLAN
-    
     try:
         data = request.get_json()
         new_plan = data.get('plan')
@@ -22,10 +23,11 @@ def change_plan():
         if new_plan not in ['basic', 'full']:
             return jsonify({'status': 'error', 'message': 'Invalid plan'}), 400
         
-        # Update global plan
-        CURRENT_PLAN = new_plan
+        # Update app-wide plan
+        with current_app.extensions['plan_lock']:
+            current_app.config['CURRENT_PLAN'] = new_plan
         
-        print(f"[/api/change-plan] Plan changed to: {new_plan}")
+        logger.info(f"[/api/change-plan] Plan changed to: {new_plan}")
         
         return jsonify({
             'status': 'success',
@@ -40,65 +42,148 @@ def change_plan():
 @main_bp.route('/api/get-plan', methods=['GET'])
 def get_plan():
     """Get current plan"""
-    global CURRENT_PLAN
     return jsonify({
         'status': 'success',
-        'plan': CURRENT_PLAN
+        'plan': current_app.config['CURRENT_PLAN']
     })
 
 
+def _get_analysis_service(app, plan):
+    """Return the app's AnalysisService for plan, creating it (and loading its analyzer) on first use"""
+    services = app.extensions['analysis_services']
+    service = services.get(plan)
+    if service is None:
+        with app.extensions['analysis_services_lock']:
+            service = services.get(plan)
+            if service is None:
+                service = AnalysisService(plan=plan)  # Pass plan to service
+                services[plan] = service
+    return service
+
+
+def _get_clone_lock(app, clone_path):
+    """Return the lock that serialises scans using clone_path"""
+    with app.extensions['clone_locks_lock']:
+        return app.extensions['clone_locks'].setdefault(clone_path, threading.Lock())
+
+
+def _prune_scan_jobs(app):
+    """Drop jobs that finished more than SCAN_JOB_TTL seconds ago"""
+    cutoff = time.time() - app.config['SCAN_JOB_TTL']
+    scan_jobs = app.extensions['scan_jobs']
+    for scan_id, job in list(scan_jobs.items()):
+        if job.get('finished_at', cutoff) < cutoff:
+            scan_jobs.pop(scan_id, None)
+
+
+def _run_analysis(app, scan_id, github_url, sector_hint, plan, shallow):
+    """Clone and analyze a repository on a background worker, recording progress in scan_jobs"""
+    scan_jobs = app.extensions['scan_jobs']
+    
+    with app.app_context():
+        try:
+            github_service = GitHubService()
+            # The working tree must not be reset or replaced by another scan while this one analyzes it
+            with _get_clone_lock(app, github_service.clone_path_for(github_url)):
+                scan_jobs[scan_id]['status'] = 'running'
+                
+                # Phase 1: Input & Analysis
+                logger.info(f"[scan {scan_id}] Phase 1: Cloning repository...")
+                repo_path = github_service.clone_repository(github_url, shallow=shallow)
+                commit_sha = github_service.get_head_commit(repo_path)
+                logger.info(f"[scan {scan_id}] Repository cloned to: {repo_path} at {commit_sha}")
+                
+                # Phase 2: Data Processing & Storage (with plan configuration)
+                logger.info(f"[scan {scan_id}] Phase 2: Starting codebase analysis with plan: {plan}...")
+                analysis_service = _get_analysis_service(app, plan)
+                scan_results = analysis_service.analyze_codebase(
+                    repo_path, sector_hint,
+                    scan_id=scan_id,
+                    cache_key=scan_cache_key(github_url, commit_sha, plan)
+                )
+            
+            scan_jobs[scan_id].update(
+                status='completed',
+                total_findings=scan_results['summary']['total_findings'],
+                finished_at=time.time()
+            )
+        
+        except Exception as e:
+            logger.error(f"[scan {scan_id}] ERROR: {str(e)}")
+            scan_jobs[scan_id].update(status='failed', message=str(e), finished_at=time.time())
+
+
 @main_bp.route('/api/analyze', methods=['POST'])
 def analyze_repository():
-    global CURRENT_PLAN
-    
     try:
         data = request.get_json()
         github_url = data.get('github_url')
         sector_hint = data.get('sector_hint', '')
-        plan = data.get('plan', CURRENT_PLAN)  # Use plan from request or global
+        plan = data.get('plan', current_app.config['CURRENT_PLAN'])  # Use plan from request or app-wide default
+        shallow = data.get('shallow', True)  # Set False to clone full history
         
-        print(f"[/api/analyze] Received request")
-        print(f"[/api/analyze] GitHub URL: {github_url}, Sector: {sector_hint}, Plan: {plan}")
+        if not github_url:
+            return jsonify({'status': 'error', 'message': 'github_url is required'}), 400
+        if plan not in ['basic', 'full']:
+            return jsonify({'status': 'error', 'message': 'Invalid plan'}), 400
         
-        # Phase 1: Input & Analysis
-        print(f"[/api/analyze] Phase 1: Cloning repository...")
-        github_service = GitHubService()
-        repo_path = github_service.clone_repository(github_url)
-        print(f"[/api/analyze] Repository cloned to: {repo_path}")
+        logger.info("[/api/analyze] Received request")
+        logger.info(f"[/api/analyze] GitHub URL: {github_url}, Sector: {sector_hint}, Plan: {plan}")
         
-        # Phase 2: Data Processing & Storage (with plan configuration)
-        print(f"[/api/analyze] Phase 2: Starting codebase analysis with plan: {plan}...")
-        analysis_service = AnalysisService(plan=plan)  # Pass plan to service
-        scan_results = analysis_service.analyze_codebase(repo_path, sector_hint)
+        # Clone + analysis take minutes, so run them off the request thread
+        scan_id = str(uuid.uuid4())
+        app = current_app._get_current_object()
+        _prune_scan_jobs(app)
+        app.extensions['scan_jobs'][scan_id] = {'status': 'queued', 'plan_used': plan}
+        app.extensions['analysis_executor'].submit(
+            _run_analysis, app, scan_id, github_url, sector_hint, plan, shallow
+        )
+        logger.info(f"[/api/analyze] Queued scan: {scan_id}")
         
         return jsonify({
-            'status': 'success',
-            'scan_id': scan_results['scan_id'],
+            'status': 'queued',
+            'scan_id': scan_id,
             'plan_used': plan,
-            'total_findings': scan_results['summary']['total_findings'],
-            'message': f'Analysis completed successfully using {plan} plan'
-        })
+            'message': f'Analysis queued using {plan} plan; poll /api/scan-status/{scan_id} for progress'
+        }), 202
     
     except Exception as e:
-        print(f"[/api/analyze] ERROR: {str(e)}")
+        logger.error(f"[/api/analyze] ERROR: {str(e)}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 
+@main_bp.route('/api/scan-status/<scan_id>', methods=['GET'])
+def scan_status(scan_id):
+    """Get progress of a queued analysis"""
+    job = current_app.extensions['scan_jobs'].get(scan_id)
+    if job is not None:
+        return jsonify({'scan_id': scan_id, **job})
+    
+    # Scans from before a restart are only known through their saved results
+    results_path = os.path.join(current_app.config['DATA_DIR'], 'scanned_results', f'{scan_id}.json')
+    if os.path.exists(results_path):
+        return jsonify({'scan_id': scan_id, 'status': 'completed'})
+    
+    return jsonify({'status': 'error', 'message': f'Unknown scan ID: {scan_id}'}), 404
+
+
 @main_bp.route('/api/generate-report', methods=['POST'])
 def generate_report():
     try:
         data = request.get_json()
         scan_id = data.get('scan_id')
         report_type = data.get('report_type')
+        report_format = data.get('format', 'docx')  # 'md' skips Word conversion
         
-        print(f"[/api/generate-report] Scan ID: {scan_id}, Type: {report_type}")
+        logger.info(f"[/api/generate-report] Scan ID: {scan_id}, Type: {report_type}")
         
         # Phase 3: Report Generation & Output
         report_service = ReportService()
-        report_path = report_service.generate_report(scan_id, report_type)
+        # send_file needs the document on disk
+        report_path = report_service.generate_report_sync(scan_id, report_type, format=report_format)
         
         return send_file(report_path, as_attachment=True)
     
     except Exception as e:
-        print(f"[/api/generate-report] ERROR: {str(e)}")
+        logger.error(f"[/api/generate-report] ERROR: {str(e)}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
\ No newline at end of file
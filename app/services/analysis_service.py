@@ -1,67 +1,98 @@
 import os
-import json
+import copy
 import uuid
+import hashlib
+import threading
+import orjson
+from collections import Counter
 from datetime import datetime
 from flask import current_app
 from analysis_engine.codet5_analyzer import CodeT5Analyzer
 from app.services.repo_info_service import RepoInfoExtractor
+from app.services.json_utils import dumps_json
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Analyzer configuration per plan
+_BASIC_CONFIG = {
+    'regex': {'enabled': False, 'timeout': 30},
+    'ast': {'enabled': False, 'timeout': 120},
+    'external_tools': {'enabled': True, 'timeout': 180},
+    'llm': {'enabled': False, 'timeout': 120, 'max_cost': 2.00},
+    'deduplicate': True,
+    'filter_low_confidence': True
+}
+_FULL_CONFIG = {
+    'regex': {'enabled': True, 'timeout': 30},
+    'ast': {'enabled': True, 'timeout': 120},
+    'external_tools': {'enabled': True, 'timeout': 180},
+    'llm': {'enabled': True, 'timeout': 120, 'max_cost': 2.00},
+    'deduplicate': True,
+    'filter_low_confidence': True
+}
+_PLAN_CONFIGS = {'basic': _BASIC_CONFIG, 'full': _FULL_CONFIG}
+
+# Parsed findings dictionary, reloaded only when the file changes on disk
+_FINDINGS_DICT_CACHE = {'mtime': None, 'data': None}
+
+def scan_cache_key(github_url, commit_sha, plan):
+    """Key identifying the analysis of one commit of a repository under a plan"""
+    return hashlib.sha1(f'{github_url}|{commit_sha}|{plan}'.encode('utf-8')).hexdigest()
+
 class AnalysisService:
     def __init__(self, plan='basic'):
         """Initialize with plan configuration"""
         self.data_dir = current_app.config['DATA_DIR']
+        self.scan_cache_dir = current_app.config['SCAN_CACHE_DIR']
+        self.scan_cache_max_bytes = current_app.config['SCAN_CACHE_MAX_BYTES']
         self.plan = plan
+        # Pretty-print saved results only while debugging; compact output is smaller and faster
+        self.indent_results = current_app.debug
         
         # Initialize analyzer with plan-specific config
-        config = self._get_plan_config(plan)
+        # Copy so the analyzer can never modify the shared module-level config
+        config = copy.deepcopy(self._get_plan_config(plan))
         self.codet5_analyzer = CodeT5Analyzer(config=config)
         self.repo_extractor = RepoInfoExtractor()
+        # The service is shared across scans; the analyzer is not known to be thread-safe
+        self._analyzer_lock = threading.Lock()
         
         logger.info(f"AnalysisService initialized with plan: {plan}")
     
     def _get_plan_config(self, plan):
-        """Get configuration based on plan"""
-        if plan == 'basic':
-            return {
-                'regex': {'enabled': False, 'timeout': 30},
-                'ast': {'enabled': False, 'timeout': 120},
-                'external_tools': {'enabled': True, 'timeout': 180},
-                'llm': {'enabled': False, 'timeout': 120, 'max_cost': 2.00},
-                'deduplicate': True,
-                'filter_low_confidence': True
-            }
-        elif plan == 'full':
-            return {
-                'regex': {'enabled': True, 'timeout': 30},
-                'ast': {'enabled': True, 'timeout': 120},
-                'external_tools': {'enabled': True, 'timeout': 180},
-                'llm': {'enabled': True, 'timeout': 120, 'max_cost': 2.00},
-                'deduplicate': True,
-                'filter_low_confidence': True
-            }
-        else:
-            # Default to basic
-            return self._get_plan_config('basic')
+        """Get configuration based on plan (unknown plans default to basic)"""
+        return _PLAN_CONFIGS.get(plan, _BASIC_CONFIG)
         
-    def analyze_codebase(self, repo_path, sector_hint):
-        """Perform comprehensive security analysis"""
+    def analyze_codebase(self, repo_path, sector_hint, scan_id=None, cache_key=None):
+        """Perform comprehensive security analysis, reusing cached analyzer output for cache_key"""
         try:
             logger.info(f"🔍 Starting comprehensive analysis for: {repo_path}")
             logger.info(f"📋 Using plan: {self.plan}")
             
-            # Generate unique scan ID
-            scan_id = str(uuid.uuid4())
+            # Generate unique scan ID unless the caller already assigned one
+            scan_id = scan_id or str(uuid.uuid4())
             
-            # Extract repository context (README, policies, dependencies)
-            logger.info("📄 Extracting repository context...")
-            repo_info = self.repo_extractor.extract(repo_path)
-            
-            # Perform analysis based on plan
-            logger.info(f"🤖 Running security analysis with {self.plan} plan...")
-            code_findings = self.codet5_analyzer.analyze(repo_path, repo_info)
+            cached_analysis = self._load_cached_results(cache_key) if cache_key else None
+            if cached_analysis is not None:
+                logger.info(f"♻️  Reusing cached analysis: {cache_key}")
+                repo_info = cached_analysis['repository_info']
+                code_findings = cached_analysis['code_findings']
+            else:
+                # Extract repository context (README, policies, dependencies)
+                logger.info("📄 Extracting repository context...")
+                repo_info = self.repo_extractor.extract(repo_path)
+                
+                # Perform analysis based on plan
+                logger.info(f"🤖 Running security analysis with {self.plan} plan...")
+                with self._analyzer_lock:
+                    code_findings = self.codet5_analyzer.analyze(repo_path, repo_info)
+                
+                if cache_key:
+                    self._store_cached_results(cache_key, {
+                        'repository_info': repo_info,
+                        'code_findings': code_findings
+                    })
             
             # Enrich findings with knowledge base
             logger.info("📚 Enriching findings with knowledge base...")
@@ -99,29 +130,39 @@ class AnalysisService:
             logger.warning(f"⚠️  Findings dictionary not found at: {dict_path}")
             return findings
         
-        with open(dict_path, 'r') as f:
-            findings_dict = json.load(f)
+        findings_dict = self._load_findings_dictionary(dict_path)
+        
+        # Skip building per-finding debug messages unless they will be emitted
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
         
-        enriched = []
-        for finding in findings:
+        enriched = [None] * len(findings)
+        for i, finding in enumerate(findings):
             keyword = finding.get('shortform_keyword')
-            if keyword in findings_dict:
+            extra = findings_dict.get(keyword)
+            if extra:
                 # Merge finding with dictionary data
-                enriched_finding = {**finding, **findings_dict[keyword]}
-                enriched.append(enriched_finding)
+                enriched[i] = {**finding, **extra}
             else:
                 # Keep finding even if not in dictionary
-                enriched.append(finding)
-                logger.debug(f"   Finding '{keyword}' not in dictionary, keeping as-is")
+                enriched[i] = finding
+                if debug_enabled:
+                    logger.debug(f"   Finding '{keyword}' not in dictionary, keeping as-is")
         
         return enriched
     
+    def _load_findings_dictionary(self, dict_path):
+        """Return the parsed findings dictionary, re-reading it only after it changes"""
+        mtime = os.stat(dict_path).st_mtime_ns
+        if _FINDINGS_DICT_CACHE['mtime'] != mtime:
+            with open(dict_path, 'rb') as f:
+                data = orjson.loads(f.read())
+            _FINDINGS_DICT_CACHE.update(data=data, mtime=mtime)
+            logger.debug(f"   Loaded findings dictionary: {len(data)} entries")
+        return _FINDINGS_DICT_CACHE['data']
+    
     def _generate_summary(self, findings):
         """Generate summary statistics"""
-        severity_counts = {}
-        for finding in findings:
-            severity = finding.get('severity', 'UNKNOWN')
-            severity_counts[severity] = severity_counts.get(severity, 0) + 1
+        severity_counts = dict(Counter(finding.get('severity', 'UNKNOWN') for finding in findings))
         
         return {
             'total_findings': len(findings),
@@ -134,7 +175,54 @@ class AnalysisService:
         os.makedirs(results_dir, exist_ok=True)
         
         results_path = os.path.join(results_dir, f'{scan_id}.json')
-        with open(results_path, 'w') as f:
-            json.dump(results, f, indent=2)
+        self._write_json(results_path, results)
+        
+        logger.info(f"💾 Scan results saved to: {results_path}")
+    
+    def _write_json(self, path, data):
+        """Serialize data to a JSON file"""
+        with open(path, 'wb') as f:
+            f.write(dumps_json(data, indent=self.indent_results) + b'\n')
+    
+    def _load_cached_results(self, cache_key):
+        """Return the cached analysis for cache_key, or None on a miss"""
+        cache_path = os.path.join(self.scan_cache_dir, f'{cache_key}.json')
+        try:
+            with open(cache_path, 'rb') as f:
+                results = orjson.loads(f.read())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"⚠️  Ignoring unreadable cache entry {cache_path}: {e}")
+            return None
+        if 'code_findings' not in results:
+            # Entries written before raw findings were cached hold enriched results only
+            return None
+        
+        # Mark as recently used for eviction
+        os.utime(cache_path)
+        return results
+    
+    def _store_cached_results(self, cache_key, results):
+        """Add an analysis to the cache, evicting least recently used entries over the size limit"""
+        try:
+            os.makedirs(self.scan_cache_dir, exist_ok=True)
+            self._write_json(os.path.join(self.scan_cache_dir, f'{cache_key}.json'), results)
+            self._evict_scan_cache()
+        except Exception as e:
+            # Caching is an optimization; never fail a completed analysis because of it
+            logger.warning(f"⚠️  Could not cache scan results: {e}")
+    
+    def _evict_scan_cache(self):
+        """Delete the least recently used cache entries until the cache fits its size limit"""
+        with os.scandir(self.scan_cache_dir) as entries:
+            cached = [(entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                      for entry in entries if entry.name.endswith('.json')]
         
-        logger.info(f"💾 Scan results saved to: {results_path}")
\ No newline at end of file
+        total_bytes = sum(size for _, size, _ in cached)
+        for _, size, path in sorted(cached):
+            if total_bytes <= self.scan_cache_max_bytes:
+                break
+            os.remove(path)
+            total_bytes -= size
+            logger.debug(f"   Evicted cached scan: {path}")
@@ -1,9 +1,21 @@
 import git
+import hashlib
 import os
 import shutil
+import threading
+from collections import Counter
 from datetime import datetime
 import stat
 from flask import current_app
+from app.services.repo_info_service import MAX_TEXT_BYTES, read_head
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Analysis only scans the current tree, so history, other branches and tags are not needed
+SHALLOW_CLONE_OPTIONS = ['--depth=1', '--single-branch', '--no-tags']
+# Mirrors only need branch objects; a --mirror clone would also pull every refs/pull/* ref on GitHub
+MIRROR_FETCH_REFSPEC = '+refs/heads/*:refs/heads/*'
 
 def _remove_readonly(func, path, _):
     """
@@ -14,23 +26,64 @@ def _remove_readonly(func, path, _):
     os.chmod(path, stat.S_IWRITE)
     func(path)
 
+def _dir_size(path):
+    """Total size in bytes of the files under path"""
+    total = 0
+    for dir_path, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.lstat(os.path.join(dir_path, filename)).st_size
+            except OSError:
+                pass
+    return total
+
 class GitHubService:
+    # Mirrors being fetched or cloned from right now, which eviction must leave alone
+    _mirror_lock = threading.Lock()
+    _mirrors_in_use = Counter()
+    
     def __init__(self):
         self.pulled_code_dir = current_app.config['PULLED_CODE_DIR']
+        self.mirror_cache_dir = current_app.config['MIRROR_CACHE_DIR']
+        self.mirror_cache_max_bytes = current_app.config['MIRROR_CACHE_MAX_BYTES']
         
-    def clone_repository(self, github_url):
-        """Clone GitHub repository to PulledCode directory (overwrites existing files)"""
+    def clone_repository(self, github_url, shallow=True):
+        """Clone GitHub repository to PulledCode directory, updating an existing clone in place"""
         try:
-            if os.path.exists(self.pulled_code_dir):
-                shutil.rmtree(self.pulled_code_dir, onerror=_remove_readonly)
             os.makedirs(self.pulled_code_dir, exist_ok=True)
             
             # Clone repository
-            repo_name = github_url.split('/')[-1].replace('.git', '')
-            clone_path = os.path.join(self.pulled_code_dir, repo_name)
+            clone_path = self.clone_path_for(github_url)
+            
+            mirror_path = self._mirror_path(github_url)
+            with self._mirror_lock:
+                self._mirrors_in_use[mirror_path] += 1
+            try:
+                # Refresh the persistent mirror so only new objects cross the network
+                self._sync_mirror(github_url, mirror_path)
+                
+                if self._is_reusable_clone(clone_path, github_url, shallow):
+                    # Same repository as last time: update the working tree instead of re-creating it
+                    logger.info(f"Updating existing clone at {clone_path} from {mirror_path}")
+                    self._update_clone(clone_path, mirror_path, shallow)
+                else:
+                    if os.path.exists(clone_path):
+                        shutil.rmtree(clone_path, onerror=_remove_readonly)
+                    
+                    logger.info(f"Cloning {github_url} to {clone_path} (reference: {mirror_path})")
+                    git.Repo.clone_from(
+                        github_url,
+                        clone_path,
+                        multi_options=self._clone_options(mirror_path, shallow)
+                    )
+            finally:
+                with self._mirror_lock:
+                    self._mirrors_in_use[mirror_path] -= 1
+                    if not self._mirrors_in_use[mirror_path]:
+                        del self._mirrors_in_use[mirror_path]
             
-            print(f"Cloning {github_url} to {clone_path}")
-            git.Repo.clone_from(github_url, clone_path)
+            # The clone is dissociated, so the mirror is no longer needed by it
+            self._evict_mirror_cache()
             
             # Log the operation
             self._log_clone_operation(github_url, clone_path)
@@ -40,6 +93,94 @@ class GitHubService:
         except Exception as e:
             raise Exception(f"Failed to clone repository: {str(e)}")
     
+    def clone_path_for(self, github_url):
+        """Return the PulledCode directory that github_url is cloned into"""
+        repo_name = github_url.split('/')[-1].replace('.git', '')
+        return os.path.join(self.pulled_code_dir, repo_name)
+    
+    def get_head_commit(self, repo_path):
+        """Return the SHA of the commit checked out at repo_path"""
+        return git.Repo(repo_path).head.commit.hexsha
+    
+    def _is_reusable_clone(self, clone_path, github_url, shallow):
+        """Check whether clone_path is a clone of github_url with the requested history depth"""
+        if not os.path.isdir(clone_path):
+            return False
+        try:
+            repo = git.Repo(clone_path)
+            is_shallow = os.path.exists(os.path.join(repo.git_dir, 'shallow'))
+            return repo.remotes.origin.url == github_url and is_shallow == shallow
+        except Exception:
+            return False
+    
+    def _update_clone(self, clone_path, mirror_path, shallow):
+        """Bring an existing clone up to date with the mirror's default branch"""
+        repo = git.Repo(clone_path)
+        # The mirror was just fetched, so this needs no network access
+        fetch_options = ['--depth=1'] if shallow else []
+        repo.git.fetch(*fetch_options, mirror_path, 'HEAD')
+        repo.git.reset('--hard', 'FETCH_HEAD')
+        repo.git.clean('-fdx')
+    
+    def _clone_options(self, mirror_path, shallow):
+        """Build git clone options for the working copy"""
+        options = ['--reference', mirror_path, '--dissociate']
+        if shallow:
+            options += SHALLOW_CLONE_OPTIONS
+        return options
+    
+    def _mirror_path(self, github_url):
+        """Return the MirrorCache path for github_url"""
+        url_hash = hashlib.sha1(github_url.encode('utf-8')).hexdigest()
+        return os.path.join(self.mirror_cache_dir, f'{url_hash}.git')
+    
+    def _sync_mirror(self, github_url, mirror_path):
+        """Create or update the bare branch mirror for this URL"""
+        os.makedirs(self.mirror_cache_dir, exist_ok=True)
+        
+        if os.path.exists(mirror_path):
+            repo = git.Repo(mirror_path)
+            if repo.config_reader().get_value('remote "origin"', 'mirror', False):
+                # Full --mirror clones from earlier versions also track pull request refs; start over
+                logger.info(f"Replacing full mirror {mirror_path} with a branch mirror")
+                shutil.rmtree(mirror_path, onerror=_remove_readonly)
+        
+        if os.path.exists(mirror_path):
+            logger.info(f"Fetching updates into mirror {mirror_path}")
+            repo.remotes.origin.fetch(prune=True)
+        else:
+            logger.info(f"Creating mirror of {github_url} at {mirror_path}")
+            repo = git.Repo.clone_from(github_url, mirror_path, bare=True, multi_options=['--no-tags'])
+            with repo.config_writer() as config:
+                # A bare clone has no fetch refspec, so later fetches would not update branches
+                config.set_value('remote "origin"', 'fetch', MIRROR_FETCH_REFSPEC)
+                config.set_value('remote "origin"', 'tagOpt', '--no-tags')
+        
+        # Mark as recently used for eviction
+        os.utime(mirror_path)
+    
+    def _evict_mirror_cache(self):
+        """Delete least recently used mirrors until MirrorCache fits its size limit"""
+        try:
+            with os.scandir(self.mirror_cache_dir) as entries:
+                mirrors = [(entry.stat().st_mtime, entry.path)
+                           for entry in entries if entry.name.endswith('.git') and entry.is_dir()]
+            
+            sized = [(mtime, _dir_size(path), path) for mtime, path in mirrors]
+            total_bytes = sum(size for _, size, _ in sized)
+            for _, size, path in sorted(sized):
+                if total_bytes <= self.mirror_cache_max_bytes:
+                    break
+                with self._mirror_lock:
+                    if path in self._mirrors_in_use:
+                        continue
+                    shutil.rmtree(path, onerror=_remove_readonly)
+                total_bytes -= size
+                logger.debug(f"Evicted mirror: {path}")
+        except Exception as e:
+            # The cache only saves bandwidth; never fail a clone because of it
+            logger.warning(f"Could not evict mirror cache: {e}")
+    
     def _log_clone_operation(self, github_url, clone_path):
         """Log clone operation for tracking"""
         log_entry = {
@@ -49,26 +190,25 @@ class GitHubService:
             'status': 'success'
         }
         # You can implement logging to file or database here
-        print(f"Repository cloned: {log_entry}")
+        logger.info(f"Repository cloned: {log_entry}")
     
     def get_repository_info(self, repo_path):
         """Extract basic repository information"""
         info = {}
+        base = os.fspath(repo_path) + os.sep
         
         # Read README.md if exists
-        readme_path = os.path.join(repo_path, 'README.md')
+        readme_path = base + 'README.md'
         if os.path.exists(readme_path):
-            with open(readme_path, 'r', encoding='utf-8') as f:
-                info['readme'] = f.read()
+            info['readme'] = read_head(readme_path, MAX_TEXT_BYTES)
         
         # Get package files for dependency analysis
         package_files = ['requirements.txt', 'package.json', 'Pipfile', 'pom.xml']
         info['dependencies'] = {}
         
         for file in package_files:
-            file_path = os.path.join(repo_path, file)
+            file_path = base + file
             if os.path.exists(file_path):
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    info['dependencies'][file] = f.read()
+                info['dependencies'][file] = read_head(file_path, MAX_TEXT_BYTES)
         
         return info
@@ -0,0 +1,25 @@
+import json
+import math
+import orjson
+
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+def _finite(value):
+    """Copy value with non-finite floats replaced by None, as orjson writes them"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    return value
+
+def dumps_json(data, indent=False):
+    """Serialize data to strict JSON bytes, using json with str() for whatever orjson rejects"""
+    try:
+        return orjson.dumps(data, option=_ORJSON_OPTIONS | (orjson.OPT_INDENT_2 if indent else 0))
+    except orjson.JSONEncodeError:
+        # e.g. integers wider than 64 bits; allow_nan=False keeps the output readable by orjson.loads
+        text = json.dumps(_finite(data), indent=2 if indent else None, default=str,
+                          ensure_ascii=False, allow_nan=False)
+        return text.encode('utf-8')
@@ -1,65 +1,122 @@
 
 import os
+import fnmatch
+import mmap
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
+# Upper bound, in bytes, on text kept per file in the scan context; read files with read_head to honour it
+MAX_TEXT_BYTES = 256 * 1024
+# Documentation files above this size are recorded by path and size only
+MAX_DOC_BYTES = 2 * 1024 * 1024
+
+def read_head(path, max_bytes):
+    """Decode at most max_bytes from the start of a text file without reading the rest"""
+    with open(path, 'rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            return ''
+        with mm:
+            head = mm[:max_bytes]
+    return head.decode('utf-8', 'ignore').replace('\r\n', '\n')
+
 class RepoInfoExtractor:
     """
     Extracts contextual information from repository for report generation
     This includes README, policy documents, and dependency files
     """
     
+    DEPENDENCY_FILES = {
+        'python': ['requirements.txt', 'Pipfile', 'pyproject.toml', 'setup.py'],
+        'javascript': ['package.json', 'package-lock.json', 'yarn.lock'],
+        'java': ['pom.xml', 'build.gradle', 'gradle.lockfile'],
+        'ruby': ['Gemfile', 'Gemfile.lock'],
+        'php': ['composer.json', 'composer.lock'],
+        'go': ['go.mod', 'go.sum'],
+        'rust': ['Cargo.toml', 'Cargo.lock'],
+        'dotnet': ['packages.config', '*.csproj']
+    }
+    
+    def __init__(self):
+        # Invert DEPENDENCY_FILES so each root entry needs a single lookup
+        self._dep_lang = {}
+        self._dep_patterns = []
+        for language, files in self.DEPENDENCY_FILES.items():
+            for filename in files:
+                if '*' in filename:
+                    self._dep_patterns.append((filename.casefold(), language))
+                else:
+                    self._dep_lang[filename.casefold()] = language
+    
     def extract(self, repo_path):
         """Extract all repository context information"""
         logger.info(f"📄 Extracting repository information from: {repo_path}")
         
-        info = {
-            'readme': self._extract_readme(repo_path),
-            'policies': self._extract_policies(repo_path),
-            'dependencies': self._extract_dependencies(repo_path),
-            'documentation': self._extract_documentation(repo_path)
+        # One directory scan replaces the per-file existence checks below
+        root_entries = self._list_root(repo_path)
+        
+        extractors = {
+            'readme': self._extract_readme,
+            'policies': self._extract_policies,
+            'dependencies': self._extract_dependencies,
+            'documentation': self._extract_documentation
         }
         
+        # Each pass only reads from disk, so they can run side by side
+        with ThreadPoolExecutor(max_workers=len(extractors)) as executor:
+            futures = {key: executor.submit(fn, repo_path, root_entries) for key, fn in extractors.items()}
+            info = {key: future.result() for key, future in futures.items()}
+        
         logger.info(f"✅ Extracted: {len(info['policies'])} policies, {len(info['dependencies'])} dependency files")
         
         return info
     
-    def _extract_readme(self, repo_path):
+    def _list_root(self, repo_path):
+        """Map casefolded file names in the repository root to their directory entries"""
+        # Keys are casefolded so lookups match regardless of case, as os.path.exists does on Windows and macOS
+        with os.scandir(repo_path) as entries:
+            return {entry.name.casefold(): entry for entry in entries}
+    
+    def _extract_readme(self, repo_path, root_entries):
         """Extract README.md content"""
         readme_files = ['README.md', 'readme.md', 'README.MD', 'Readme.md']
         
         for readme_name in readme_files:
-            readme_path = os.path.join(repo_path, readme_name)
-            if os.path.exists(readme_path):
+            readme_entry = root_entries.get(readme_name.casefold())
+            if readme_entry is not None:
+                readme_path = readme_entry.path
                 try:
-                    with open(readme_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        content = f.read()
-                        logger.debug(f"   Found README: {readme_name}")
-                        return content
+                    content = read_head(readme_path, MAX_TEXT_BYTES)
+                    logger.debug(f"   Found README: {readme_name}")
+                    return content
                 except Exception as e:
                     logger.warning(f"⚠️  Error reading {readme_name}: {e}")
         
         logger.debug("   No README found")
         return None
     
-    def _extract_policies(self, repo_path):
+    def _extract_policies(self, repo_path, root_entries):
         """Extract policy documents (HIPAA, privacy, etc.)"""
         policies = {}
         
         # Look for policies directory
-        policy_dir = os.path.join(repo_path, 'policies')
+        policy_dir = root_entries.get('policies')
         
-        if os.path.exists(policy_dir) and os.path.isdir(policy_dir):
-            for filename in os.listdir(policy_dir):
-                if filename.endswith('.md'):
-                    file_path = os.path.join(policy_dir, filename)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            policies[filename] = f.read()
-                            logger.debug(f"   Found policy: {filename}")
-                    except Exception as e:
-                        logger.warning(f"⚠️  Error reading policy {filename}: {e}")
+        if policy_dir is not None and policy_dir.is_dir():
+            with os.scandir(policy_dir.path) as entries:
+                policy_entries = [entry for entry in entries if entry.name.endswith('.md') and entry.is_file()]
+            
+            for entry in policy_entries:
+                filename = entry.name
+                try:
+                    policies[filename] = read_head(entry.path, MAX_TEXT_BYTES)
+                    logger.debug(f"   Found policy: {filename}")
+                except Exception as e:
+                    logger.warning(f"⚠️  Error reading policy {filename}: {e}")
         
         # Also look for common policy files in root
         common_policy_files = [
@@ -69,72 +126,118 @@ class RepoInfoExtractor:
             'CODE_OF_CONDUCT.md'
         ]
         
+        read_paths = set()
         for filename in common_policy_files:
-            file_path = os.path.join(repo_path, filename)
-            if os.path.exists(file_path):
+            entry = root_entries.get(filename.casefold())
+            # 'SECURITY.md' and 'security.md' resolve to the same entry
+            if entry is not None and entry.path not in read_paths:
+                read_paths.add(entry.path)
+                file_path = entry.path
                 try:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        policies[filename] = f.read()
-                        logger.debug(f"   Found policy: {filename}")
+                    policies[filename] = read_head(file_path, MAX_TEXT_BYTES)
+                    logger.debug(f"   Found policy: {filename}")
                 except Exception as e:
                     logger.warning(f"⚠️  Error reading {filename}: {e}")
         
         return policies
     
-    def _extract_dependencies(self, repo_path):
+    def _extract_dependencies(self, repo_path, root_entries):
         """Extract dependency files"""
         dependencies = {}
         
-        dependency_files = {
-            'python': ['requirements.txt', 'Pipfile', 'pyproject.toml', 'setup.py'],
-            'javascript': ['package.json', 'package-lock.json', 'yarn.lock'],
-            'java': ['pom.xml', 'build.gradle', 'gradle.lockfile'],
-            'ruby': ['Gemfile', 'Gemfile.lock'],
-            'php': ['composer.json', 'composer.lock'],
-            'go': ['go.mod', 'go.sum'],
-            'rust': ['Cargo.toml', 'Cargo.lock'],
-            'dotnet': ['packages.config', '*.csproj']
-        }
-        
-        for language, files in dependency_files.items():
-            for filename in files:
-                file_path = os.path.join(repo_path, filename)
-                if os.path.exists(file_path):
-                    try:
-                        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            dependencies[filename] = {
-                                'language': language,
-                                'content': f.read()
-                            }
-                            logger.debug(f"   Found dependency file: {filename} ({language})")
-                    except Exception as e:
-                        logger.warning(f"⚠️  Error reading {filename}: {e}")
+        for entry in root_entries.values():
+            filename = entry.name
+            language = self._dependency_language(filename)
+            if language is None or not entry.is_file():
+                continue
+            
+            try:
+                dependencies[filename] = {
+                    'language': language,
+                    'content': read_head(entry.path, MAX_TEXT_BYTES)
+                }
+                logger.debug(f"   Found dependency file: {filename} ({language})")
+            except Exception as e:
+                logger.warning(f"⚠️  Error reading {filename}: {e}")
         
         return dependencies
     
-    def _extract_documentation(self, repo_path):
+    def _dependency_language(self, filename):
+        """Return the ecosystem a dependency manifest belongs to, or None"""
+        filename = filename.casefold()
+        language = self._dep_lang.get(filename)
+        if language is None:
+            for pattern, pattern_language in self._dep_patterns:
+                if fnmatch.fnmatchcase(filename, pattern):
+                    return pattern_language
+        return language
+    
+    def _extract_documentation(self, repo_path, root_entries):
         """Extract additional documentation files"""
         documentation = {}
         
         # Look for docs directory
         docs_dirs = ['docs', 'documentation', 'doc']
         
+        to_read = []
         for docs_dir_name in docs_dirs:
-            docs_path = os.path.join(repo_path, docs_dir_name)
+            docs_entry = root_entries.get(docs_dir_name.casefold())
             
-            if os.path.exists(docs_path) and os.path.isdir(docs_path):
-                for root, dirs, files in os.walk(docs_path):
-                    for filename in files:
-                        if filename.endswith(('.md', '.txt', '.rst')):
-                            file_path = os.path.join(root, filename)
-                            relative_path = os.path.relpath(file_path, repo_path)
-                            
-                            try:
-                                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                                    documentation[relative_path] = f.read()
-                                    logger.debug(f"   Found documentation: {relative_path}")
-                            except Exception as e:
-                                logger.warning(f"⚠️  Error reading {relative_path}: {e}")
+            if docs_entry is not None and docs_entry.is_dir():
+                # Entries below docs_entry share its path as a prefix, so slice instead of relpath
+                prefix_len = len(docs_entry.path)
+                for entry in self._find_documentation_files(docs_entry.path):
+                    relative_path = docs_dir_name + entry.path[prefix_len:]
+                    try:
+                        size = entry.stat().st_size
+                    except OSError as e:
+                        logger.warning(f"⚠️  Error reading {relative_path}: {e}")
+                        continue
+                    
+                    if size > MAX_DOC_BYTES:
+                        documentation[relative_path] = {'path': relative_path, 'size': size}
+                        logger.debug(f"   Skipped large documentation: {relative_path} ({size} bytes)")
+                    else:
+                        to_read.append((relative_path, entry.path))
+        
+        if not to_read:
+            return documentation
+        
+        # Overlap the blocking reads; file I/O releases the GIL
+        with ThreadPoolExecutor(max_workers=min(8, len(to_read))) as executor:
+            contents = executor.map(self._read_documentation_file, to_read)
+            for (relative_path, _), content in zip(to_read, contents):
+                if content is not None:
+                    documentation[relative_path] = content
         
         return documentation
-
+    
+    def _find_documentation_files(self, docs_path):
+        """Yield directory entries for documentation files anywhere under docs_path"""
+        pending = [docs_path]
+        while pending:
+            dir_path = pending.pop()
+            try:
+                entries = os.scandir(dir_path)
+            except OSError as e:
+                # Match os.walk, which skips directories it cannot list
+                logger.warning(f"⚠️  Error listing {dir_path}: {e}")
+                continue
+            
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.name.endswith(('.md', '.txt', '.rst')) and entry.is_file():
+                        yield entry
+    
+    def _read_documentation_file(self, paths):
+        """Read one documentation file, returning None if it cannot be read"""
+        relative_path, file_path = paths
+        try:
+            content = read_head(file_path, MAX_TEXT_BYTES)
+            logger.debug(f"   Found documentation: {relative_path}")
+            return content
+        except Exception as e:
+            logger.warning(f"⚠️  Error reading {relative_path}: {e}")
+            return None
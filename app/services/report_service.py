@@ -1,82 +1,282 @@
 import os
-import json
-import google.generativeai as genai
+import re
+import asyncio
+import functools
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 from flask import current_app
-from docx import Document
-from datetime import datetime
+from app.services.json_utils import dumps_json
+import time
+from pathlib import Path
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _dump_scan_results(scan_results):
+    """Serialize scan results for the Gemini prompt"""
+    return dumps_json(scan_results, indent=True).decode('utf-8')
+
+_ROW_MARKER = re.compile(r'^\s*\**ROW (\d+):\**[ \t]*', re.MULTILINE)
+
+def _split_rows(text):
+    """Split a batched Gemini response into {row number: answer text}"""
+    markers = list(_ROW_MARKER.finditer(text))
+    rows = {}
+    for marker, next_marker in zip(markers, markers[1:] + [None]):
+        end = next_marker.start() if next_marker else len(text)
+        rows[int(marker.group(1))] = text[marker.end():end].strip()
+    return rows
+
+@functools.lru_cache(maxsize=64)
+def _load_scan_results_cached(results_path, mtime_ns):
+    """Parse a scan results file; the returned dict is shared between callers and must not be modified"""
+    with open(results_path, 'rb') as f:
+        return orjson.loads(f.read())
+
+def _iter_paragraphs(content):
+    """Yield the non-empty, stripped paragraphs of markdown text or of an iterable of chunks"""
+    chunks = (content,) if isinstance(content, str) else content
+    pending = ''
+    for chunk in chunks:
+        pending += chunk
+        start = 0
+        end = pending.find('\n\n')
+        while end != -1:
+            paragraph = pending[start:end].strip()
+            if paragraph:
+                yield paragraph
+            start = end + 2
+            end = pending.find('\n\n', start)
+        pending = pending[start:]
+    
+    paragraph = pending.strip()
+    if paragraph:
+        yield paragraph
+
+def _split_heading(paragraph):
+    """Return (heading level, text) for a markdown paragraph; level is 0 for body text"""
+    # Only the leading '#' run matters, so look at those characters and nothing else
+    i = 0
+    n = len(paragraph)
+    while i < n and i < 6 and paragraph[i] == '#':
+        i += 1
+    if 0 < i < n and paragraph[i] == ' ':
+        return i, paragraph[i + 1:].strip()
+    return 0, paragraph.strip()
+
+def _excerpt(text, limit):
+    """Strip text and cut it to limit characters, marking truncation with '...'"""
+    text = text.strip()
+    return text if len(text) <= limit else text[:limit] + '...'
 
 class ReportService:
+    TEMPLATE_FILES = {
+        'regulatory_compliance': 'regulatory_compliance_template.md',
+        'technical_operational': 'technical_operational_template.md',
+        'business_focused': 'business_focused_template.md'
+    }
+    
+    # Shared by all instances, since a new ReportService is created per request
+    _template_cache = {}
+    _prompt_prefix_cache = {}
+    # Documents are zipped and written here so callers are not blocked on doc.save
+    _save_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='docx-save')
+    
     def __init__(self):
         self.data_dir = current_app.config['DATA_DIR']
         self.templates_dir = current_app.config['TEMPLATES_DIR']
+        self.request_timeout = current_app.config.get('GEMINI_TIMEOUT', 30)
+        self.stream_timeout = current_app.config.get('GEMINI_STREAM_TIMEOUT', 600)
+        self.max_retries = 2
+        # Pending background saves, keyed by report path
+        self._save_futures = {}
         
         # Configure Gemini API if API key is provided; otherwise operate in local-fallback mode
         gemini_key = os.getenv('GEMINI_API_KEY')
         if gemini_key:
             try:
+                # Imported here so workers without Gemini configured never load the SDK
+                import google.generativeai as genai
                 genai.configure(api_key=gemini_key)
                 self.model = genai.GenerativeModel('gemini-2.5-pro')
             except Exception as e:
                 # If model initialization fails, fall back to local generator and log
-                print(f"[ReportService] Gemini init failed: {e}")
+                logger.warning(f"Gemini init failed: {e}")
                 self.model = None
         else:
-            print("[ReportService] GEMINI_API_KEY not set — using local report generator fallback.")
+            logger.info("GEMINI_API_KEY not set — using local report generator fallback.")
             self.model = None
     
-    def generate_report(self, scan_id, report_type):
-        """Generate report using Gemini with appropriate template"""
+    def generate_report(self, scan_id, report_type, format='docx'):
+        """Generate report using Gemini with appropriate template (docx files finish saving in the background)"""
         try:
-            print(f"[ReportService] generate_report called with scan_id={scan_id}, report_type={report_type}")
+            logger.info(f"generate_report called with scan_id={scan_id}, report_type={report_type}")
             # Load scan results
             scan_results = self._load_scan_results(scan_id)
-            print(f"[ReportService] Loaded scan results for {scan_id}; findings={len(scan_results.get('findings', []))}")
-            
-            # Load appropriate template
-            template = self._load_template(report_type)
-            print(f"[ReportService] Loaded template for {report_type} (length={len(template)} chars)")
+            logger.info(f"Loaded scan results for {scan_id}; findings={len(scan_results.get('findings', []))}")
             
-            # Generate report content using Gemini
-            report_content = self._generate_with_gemini(scan_results, template, report_type)
+            return self._generate_one(scan_id, scan_results, report_type, format)
             
-            # Format and save report
-            report_path = self._format_and_save_report(report_content, scan_id, report_type)
+        except Exception as e:
+            raise Exception(f"Report generation failed: {str(e)}")
+    
+    async def generate_reports(self, scan_id, report_types, format='docx'):
+        """Generate several report types for one scan concurrently, returning {report_type: path}"""
+        try:
+            logger.info(f"generate_reports called with scan_id={scan_id}, report_types={report_types}")
+            scan_results = self._load_scan_results(scan_id)
             
-            return report_path
+            report_paths = await asyncio.gather(*(
+                asyncio.to_thread(self._generate_one, scan_id, scan_results, report_type, format)
+                for report_type in report_types
+            ))
+            # Batch callers get finished files
+            pending_saves = [self._save_futures.pop(path, None) for path in report_paths]
+            await asyncio.gather(*(asyncio.wrap_future(future) for future in pending_saves if future is not None))
+            return dict(zip(report_types, report_paths))
             
         except Exception as e:
             raise Exception(f"Report generation failed: {str(e)}")
     
+    def generate_report_sync(self, scan_id, report_type, format='docx'):
+        """Generate a report and wait until it has been written to disk"""
+        report_path = self.generate_report(scan_id, report_type, format)
+        self.wait_for_report(report_path)
+        return report_path
+    
+    def wait_for_report(self, report_path):
+        """Block until the background save of report_path finishes, re-raising any save error"""
+        future = self._save_futures.pop(report_path, None)
+        if future is not None:
+            try:
+                future.result()
+            except Exception as e:
+                raise Exception(f"Report generation failed: {str(e)}")
+    
+    def _generate_one(self, scan_id, scan_results, report_type, format='docx'):
+        """Generate and save a single report from already loaded scan results"""
+        if format not in ('docx', 'md'):
+            raise ValueError(f"Unknown report format: {format}")
+        
+        # Load appropriate template
+        template = self._load_template(report_type)
+        logger.info(f"Loaded template for {report_type} (length={len(template)} chars)")
+        
+        # Generate report content using Gemini, streamed so the document is built as text arrives
+        report_content = self._generate_with_gemini_stream(scan_results, template, report_type)
+        
+        # Format and save report
+        if format == 'md':
+            return self._save_markdown_report(report_content, scan_id, report_type)
+        return self._format_and_save_report(report_content, scan_id, report_type)
+    
     def _load_template(self, report_type):
         """Load template based on report type"""
-        template_mapping = {
-            'regulatory_compliance': 'regulatory_compliance_template.md',
-            'technical_operational': 'technical_operational_template.md',
-            'business_focused': 'business_focused_template.md'
-        }
-        
-        template_file = template_mapping.get(report_type)
+        template_file = self.TEMPLATE_FILES.get(report_type)
         if not template_file:
             raise ValueError(f"Unknown report type: {report_type}")
         
         template_path = os.path.join(self.templates_dir, template_file)
         
+        # Templates do not change at runtime, so each is read from disk only once per process
+        template = self._template_cache.get(template_path)
+        if template is not None:
+            return template
+        
         if not os.path.exists(template_path):
             raise FileNotFoundError(f"Template not found: {template_path}")
         
-        with open(template_path, 'r', encoding='utf-8') as f:
-            return f.read()
+        # Normalize line endings ourselves, as text mode would, since paragraphs are split on '\n\n'
+        template = Path(template_path).read_bytes().decode('utf-8').replace('\r\n', '\n')
+        self._template_cache[template_path] = template
+        return template
     
-    def _generate_with_gemini(self, scan_results, template, report_type):
-        """Use Gemini to generate report content"""
-        prompt = f"""
-        You are a professional security report generator. Use the provided template and security scan data to create a comprehensive {report_type.replace('_', ' ')} report.
+    def _generate_with_gemini_stream(self, scan_results, template, report_type):
+        """Use Gemini to generate report content, yielding the text in chunks as it is produced"""
+        if not self.model:
+            yield self._local_generate(scan_results, template, report_type)
+            return
 
-        TEMPLATE:
-        {template}
+        prompt = self._build_prompt(scan_results, template, report_type)
+        emitted = False
+        try:
+            for chunk in self._call_gemini(prompt, stream=True):
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. a safety or recitation stop) raise on .text
+                    logger.warning(f"Gemini returned a chunk without text: {getattr(chunk, 'candidates', None)}")
+                    continue
+                if text:
+                    emitted = True
+                    yield text
+        except Exception as e:
+            logger.warning(f"Gemini generation failed: {e}")
+            if emitted:
+                # Part of the report has already been written out; it cannot be swapped for the fallback
+                yield ('\n\n> Note: report generation was interrupted; the content above is incomplete. '
+                       'The locally generated report follows.\n\n')
+            yield self._local_generate(scan_results, template, report_type)
 
-        SECURITY SCAN DATA:
-        {json.dumps(scan_results, indent=2)}
+    def _call_gemini(self, prompt, **kwargs):
+        """Call Gemini with a request deadline, retrying attempts that exceed it"""
+        # Installed with google.generativeai, which is only loaded once a model exists
+        from google.api_core.exceptions import DeadlineExceeded
+        
+        # The API client enforces the deadline and stops the call; a streamed
+        # request's deadline covers the whole response, so it gets a longer one
+        timeout = self.stream_timeout if kwargs.get('stream') else self.request_timeout
+        attempts = self.max_retries + 1
+        for attempt in range(1, attempts + 1):
+            try:
+                return self.model.generate_content(prompt, request_options={'timeout': timeout}, **kwargs)
+            except DeadlineExceeded:
+                logger.warning(f"Gemini request timed out after {timeout}s (attempt {attempt}/{attempts})")
+        
+        raise TimeoutError(f"Gemini did not respond within {timeout}s after {attempts} attempts")
+
+    def _generate_findings_batched(self, findings, instruction, batch_size=20):
+        """Run one Gemini request per batch of findings, returning one text or None per finding"""
+        results = [None] * len(findings)
+        if not self.model:
+            return results
+        
+        for start in range(0, len(findings), batch_size):
+            batch = findings[start:start + batch_size]
+            rows = '\n\n'.join(
+                f"ROW {i}:\n{_dump_scan_results(finding)}" for i, finding in enumerate(batch, 1)
+            )
+            prompt = (
+                f"{instruction}\n\n"
+                f"Answer every row below separately. Start each answer with its marker "
+                f"on its own line (ROW 1:, ROW 2:, ...) and keep the rows in order.\n\n{rows}"
+            )
+            
+            try:
+                response = self._call_gemini(prompt)
+                text = getattr(response, 'text', str(response))
+            except Exception as e:
+                logger.warning(f"Gemini batch for findings {start + 1}-{start + len(batch)} failed: {e}")
+                continue
+            
+            for row, answer in _split_rows(text).items():
+                if 1 <= row <= len(batch):
+                    results[start + row - 1] = answer
+        
+        return results
+
+    def _build_prompt(self, scan_results, template, report_type):
+        """Assemble the full Gemini prompt"""
+        scan_json = _dump_scan_results(scan_results)
+        return self._prompt_prefix(report_type, template) + '\nSECURITY SCAN DATA:\n' + scan_json + '\n\nGenerate the complete report:'
+
+    def _prompt_prefix(self, report_type, template):
+        """Return the invariant part of the Gemini prompt (instructions and template) for a report type"""
+        key = (report_type, template)
+        prefix = self._prompt_prefix_cache.get(key)
+        if prefix is None:
+            prefix = f"""
+        You are a professional security report generator. Use the provided template and security scan data to create a comprehensive {report_type.replace('_', ' ')} report.
 
         Instructions:
         1. Follow the template structure exactly
@@ -85,121 +285,108 @@ class ReportService:
         4. Include specific findings with file paths and line numbers where applicable
         5. Provide actionable recommendations
         6. Ensure compliance mappings are accurate
-        
-        Generate the complete report:
-        """
-        
-        # If the model is not available, use a local generator fallback
-        if not self.model:
-            return self._local_generate(scan_results, template, report_type)
 
-        try:
-            response = self.model.generate_content(prompt)
-            # Some genai responses may wrap content differently; attempt to return the textual output
-            return getattr(response, 'text', str(response))
-        except Exception as e:
-            print(f"[ReportService] Gemini generation failed: {e}")
-            # Fallback to local generation rather than raising to avoid 500s
-            return self._local_generate(scan_results, template, report_type)
+        TEMPLATE:
+        {template}
+        """
+            self._prompt_prefix_cache[key] = prefix
+        return prefix
 
     def _local_generate(self, scan_results, template, report_type):
         """A minimal local report generator used when Gemini is unavailable.
         It merges the template with a findings summary and repository context.
         """
+        # One block per entry; the final join supplies the blank lines between blocks
         parts = []
 
         # Header and template inclusion
         parts.append(f"# {report_type.replace('_', ' ').title()} (Local Generated)")
-        parts.append('\n')
         parts.append(template)
 
         # Executive summary derived from repo context (README) when available
         repo_info = scan_results.get('repo_info', {})
-        parts.append('\n\n## Executive Summary')
-        readme_text = None
-        for k, v in repo_info.get('found', {}).items():
-            if k.startswith('README'):
-                readme_text = v.get('content')
-                break
+        parts.append('## Executive Summary')
+        found = repo_info.get('found', {})
+        # Probe the usual README names first; only fall back to scanning keys for unusual ones
+        readme_entry = (found.get('README.md') or found.get('README') or found.get('README.rst')
+                        or next((v for k, v in found.items() if k.startswith('README')), None))
+        readme_text = readme_entry.get('content') if readme_entry else None
 
         if readme_text:
             # include a short excerpt from README to give business context
-            excerpt = readme_text.strip()[:1200]
             parts.append('Context from repository README:')
-            parts.append(excerpt + ('...' if len(readme_text) > 1200 else ''))
+            parts.append(_excerpt(readme_text, 1200))
         else:
             parts.append('No README found; executive summary is derived from scan findings and templates.')
 
         # Scan Summary
-        parts.append('\n\n## Scan Summary')
+        parts.append('## Scan Summary')
         summary = scan_results.get('summary', {})
-        parts.append(f"- Total findings: {summary.get('total_findings', 0)}")
+        summary_lines = [f"- Total findings: {summary.get('total_findings', 0)}"]
         severity = summary.get('severity_breakdown', {})
         for sev, count in severity.items():
-            parts.append(f"- {sev}: {count}")
+            summary_lines.append(f"- {sev}: {count}")
+        parts.append('\n'.join(summary_lines))
 
         # Detailed Findings / Analysis
-        parts.append('\n\n## Detailed Findings and Analysis')
+        parts.append('## Detailed Findings and Analysis')
         findings = scan_results.get('findings', [])
         if not findings:
             parts.append('No findings detected during automated analysis.')
         else:
             for idx, f in enumerate(findings, 1):
-                title = f.get('title') or f.get('shortform_keyword')
-                short = f.get('shortform_keyword')
-                path = f.get('file_path') or 'N/A'
-                line = f.get('line_number')
-                sev = f.get('severity')
-                desc = f.get('description') or ''
-                snippet = f.get('context_snippet') or ''
-                remediation = f.get('remediation') or 'Refer to template remediation.'
-                compliance = f.get('compliance') or []
-
-                parts.append(f"### {idx}. {title} ({short})")
-                parts.append(f"- Severity: {sev}")
-                parts.append(f"- Location: {path}:{line}")
-                if desc:
-                    parts.append(f"- Description: {desc}")
-                if snippet:
-                    parts.append('\n**Evidence (code snippet):**')
-                    # keep snippet short
-                    parts.append('```')
-                    parts.append(snippet.strip()[:800])
-                    parts.append('```')
-                parts.append(f"- Recommendation: {remediation}")
-                if compliance:
-                    parts.append(f"- Compliance mappings: {', '.join(compliance)}")
-                parts.append('\n')
+                get = f.get
+                short = get('shortform_keyword')
+                title = get('title') or short
+                desc = get('description')
+                snippet = get('context_snippet')
+                compliance = get('compliance')
+
+                # Optional sections collapse to '' so each finding is rendered by one f-string
+                desc_line = f"\n- Description: {desc}" if desc else ''
+                # keep snippet short
+                evidence = f"\n\n**Evidence (code snippet):**\n\n```\n{_excerpt(snippet, 800)}\n```" if snippet else ''
+                compliance_line = f"\n- Compliance mappings: {', '.join(compliance)}" if compliance else ''
+
+                parts.append(
+                    f"### {idx}. {title} ({short})\n\n"
+                    f"- Severity: {get('severity')}\n"
+                    f"- Location: {get('file_path') or 'N/A'}:{get('line_number')}{desc_line}{evidence}\n\n"
+                    f"- Recommendation: {get('remediation') or 'Refer to template remediation.'}{compliance_line}"
+                )
 
         # Gemini Analysis Integration
         gemini_analysis = scan_results.get('gemini_analysis', {})
         if gemini_analysis:
-            parts.append('\n\n## Gemini Analysis')
+            parts.append('## Gemini Analysis')
             for section, content in gemini_analysis.items():
                 parts.append(f"### {section}")
                 parts.append(content)
 
         # Repository Policy and Context excerpts
         if repo_info.get('policy_files'):
-            parts.append('\n\n## Repository Policies (excerpts)')
+            parts.append('## Repository Policies (excerpts)')
             for ppath, content in repo_info.get('policy_files', {}).items():
-                excerpt = content.strip()[:1000]
                 parts.append(f"### {ppath}")
-                parts.append(excerpt + ('...' if len(content) > 1000 else ''))
+                parts.append(_excerpt(content, 1000))
 
         # Methodology and Limitations
-        parts.append('\n\n## Methodology')
-        parts.append('Automated scanners used:')
-        parts.append('- CodeT5-based static heuristics (pattern checks)')
-        parts.append('- SCA heuristics scanning requirements.txt and package.json')
-        parts.append('- Repository context extractor for README and policy files')
-
-        parts.append('\n\n## Limitations')
-        parts.append('- The CodeT5 analyzer currently only processes Python files; other languages may not be covered.')
-        parts.append('- SCA is heuristic-based and does not perform CVE lookups or transitive analysis.')
-        parts.append('- This automated report is intended as a starting point; manual review is recommended for high-severity findings.')
-
-        parts.append('\n\n-- End of report (generated locally) --')
+        parts.append('## Methodology')
+        parts.append('\n'.join([
+            'Automated scanners used:',
+            '- CodeT5-based static heuristics (pattern checks)',
+            '- SCA heuristics scanning requirements.txt and package.json',
+            '- Repository context extractor for README and policy files'
+        ]))
+
+        parts.append('## Limitations')
+        parts.append('\n'.join([
+            '- The CodeT5 analyzer currently only processes Python files; other languages may not be covered.',
+            '- SCA is heuristic-based and does not perform CVE lookups or transitive analysis.',
+            '- This automated report is intended as a starting point; manual review is recommended for high-severity findings.'
+        ]))
+
+        parts.append('-- End of report (generated locally) --')
         return '\n\n'.join(parts)
     
     def _load_scan_results(self, scan_id):
@@ -209,19 +396,15 @@ class ReportService:
         if not os.path.exists(results_path):
             raise FileNotFoundError(f"Scan results not found for ID: {scan_id}")
         
-        with open(results_path, 'r') as f:
-            return json.load(f)
+        # Keyed on mtime so a rewritten results file is parsed again
+        return _load_scan_results_cached(results_path, os.stat(results_path).st_mtime_ns)
     
     def _format_and_save_report(self, content, scan_id, report_type):
-        """Format report content and save as document"""
-        # Create reports directory if it doesn't exist
-        reports_dir = os.path.join(self.data_dir, 'generated_reports')
-        os.makedirs(reports_dir, exist_ok=True)
+        """Format report content (full text or an iterable of chunks) and save as document"""
+        # Imported here so markdown-only and non-report code paths never load python-docx
+        from docx import Document
         
-        # Generate filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{report_type}_{scan_id}_{timestamp}.docx"
-        report_path = os.path.join(reports_dir, filename)
+        report_path = self._report_path(scan_id, report_type, 'docx')
         
         # Create Word document
         doc = Document()
@@ -230,17 +413,48 @@ class ReportService:
         title = doc.add_heading(f'Security {report_type.replace("_", " ").title()} Report', 0)
         
         # Split content into paragraphs and add to document
-        paragraphs = content.split('\n\n')
-        for paragraph in paragraphs:
-            if paragraph.strip():
-                if paragraph.startswith('#'):
-                    # Handle headers
-                    level = paragraph.count('#')
-                    text = paragraph.strip('#').strip()
-                    doc.add_heading(text, level)
-                else:
-                    doc.add_paragraph(paragraph.strip())
-        
-        # Save document
-        doc.save(report_path)
+        for paragraph in _iter_paragraphs(content):
+            self._add_paragraph(doc, paragraph)
+        
+        # Save document in the background
+        self._save_futures[report_path] = self._save_pool.submit(doc.save, report_path)
         return report_path
+    
+    def _save_markdown_report(self, content, scan_id, report_type):
+        """Write report content to disk as markdown, without any document conversion"""
+        report_path = self._report_path(scan_id, report_type, 'md')
+        
+        chunks = (content,) if isinstance(content, str) else content
+        try:
+            with open(report_path, 'w', encoding='utf-8') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        except Exception:
+            # Do not leave a half-written report behind
+            if os.path.exists(report_path):
+                os.remove(report_path)
+            raise
+        
+        return report_path
+    
+    def _report_path(self, scan_id, report_type, extension):
+        """Build a timestamped path for a new report file"""
+        # Create reports directory if it doesn't exist
+        reports_dir = os.path.join(self.data_dir, 'generated_reports')
+        os.makedirs(reports_dir, exist_ok=True)
+        
+        # Generate filename
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        filename = f"{report_type}_{scan_id}_{timestamp}.{extension}"
+        return f"{reports_dir}{os.sep}{filename}"
+    
+    def _add_paragraph(self, doc, paragraph):
+        """Add one markdown paragraph to the document as a heading or body text"""
+        level, text = _split_heading(paragraph)
+        if not text:
+            return
+        if level:
+            # Handle headers
+            doc.add_heading(text, level)
+        else:
+            doc.add_paragraph(text)
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import time
+import unittest
+
+try:
+    from app.services.analysis_service import AnalysisService
+except ImportError:
+    # The analyzer lives outside this repository (see create_app)
+    AnalysisService = None
+
+
+@unittest.skipIf(AnalysisService is None, 'analysis_engine is not importable')
+class ScanCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        # Only the cache settings are needed; skip loading the analyzer
+        self.service = AnalysisService.__new__(AnalysisService)
+        self.service.scan_cache_dir = self.tmp.name
+        self.service.indent_results = False
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def add_entry(self, cache_key, size, age):
+        path = os.path.join(self.tmp.name, f'{cache_key}.json')
+        with open(path, 'wb') as f:
+            f.write(b' ' * size)
+        used = time.time() - age
+        os.utime(path, (used, used))
+
+    def cached_keys(self):
+        return sorted(name[:-len('.json')] for name in os.listdir(self.tmp.name))
+
+    def test_least_recently_used_entries_are_evicted_first(self):
+        self.add_entry('old', 100, age=300)
+        self.add_entry('middle', 100, age=200)
+        self.add_entry('new', 100, age=100)
+        self.service.scan_cache_max_bytes = 250
+
+        self.service._evict_scan_cache()
+
+        self.assertEqual(self.cached_keys(), ['middle', 'new'])
+
+    def test_nothing_is_evicted_within_the_limit(self):
+        self.add_entry('a', 100, age=200)
+        self.add_entry('b', 100, age=100)
+        self.service.scan_cache_max_bytes = 200
+
+        self.service._evict_scan_cache()
+
+        self.assertEqual(self.cached_keys(), ['a', 'b'])
+
+    def test_cache_hit_marks_entry_as_recently_used(self):
+        self.service.scan_cache_max_bytes = 10 ** 6
+        self.service._store_cached_results('hit', {'repository_info': {}, 'code_findings': []})
+        self.add_entry('other', 10, age=50)
+        os.utime(os.path.join(self.tmp.name, 'hit.json'), (0, 0))
+
+        self.assertEqual(self.service._load_cached_results('hit'), {'repository_info': {}, 'code_findings': []})
+
+        self.service.scan_cache_max_bytes = 45
+        self.service._evict_scan_cache()
+        self.assertEqual(self.cached_keys(), ['hit'])
+
+    def test_entries_without_raw_findings_are_misses(self):
+        self.service.scan_cache_max_bytes = 10 ** 6
+        self.service._store_cached_results('legacy', {'findings': []})
+
+        self.assertIsNone(self.service._load_cached_results('legacy'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import tempfile
+import unittest
+
+import orjson
+
+from app.services.json_utils import dumps_json
+
+
+class FloatSubclass(float):
+    pass
+
+
+class DumpsJsonTest(unittest.TestCase):
+    def test_orjson_path_writes_non_finite_floats_as_null(self):
+        self.assertEqual(orjson.loads(dumps_json({'a': float('nan')})), {'a': None})
+
+    def test_fallback_output_is_readable_by_orjson(self):
+        data = {
+            'big': 2 ** 70,
+            'score': FloatSubclass(0.5),
+            'nan': float('nan'),
+            'inf': [float('inf'), -float('inf')],
+            'nested': {'x': (1, float('nan'))},
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'results.json')
+            with open(path, 'wb') as f:
+                f.write(dumps_json(data, indent=True))
+            with open(path, 'rb') as f:
+                loaded = orjson.loads(f.read())
+
+        # orjson reads integers wider than 64 bits back as floats
+        self.assertEqual(loaded['big'], float(2 ** 70))
+        self.assertEqual(loaded['score'], 0.5)
+        self.assertIsNone(loaded['nan'])
+        self.assertEqual(loaded['inf'], [None, None])
+        self.assertEqual(loaded['nested'], {'x': [1, None]})
+
+    def test_unknown_types_fall_back_to_str(self):
+        marker = object()
+        loaded = orjson.loads(dumps_json({'m': marker, 'big': 2 ** 70}))
+        self.assertEqual(loaded['m'], str(marker))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+
+from app.services.repo_info_service import MAX_TEXT_BYTES, RepoInfoExtractor
+
+
+class RootLookupTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.repo_path = self.tmp.name
+        self.extractor = RepoInfoExtractor()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, content='x'):
+        path = os.path.join(self.repo_path, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    def test_list_root_keys_are_casefolded(self):
+        self.write('ReadMe.md')
+        root_entries = self.extractor._list_root(self.repo_path)
+        self.assertEqual(list(root_entries), ['readme.md'])
+        self.assertEqual(root_entries['readme.md'].name, 'ReadMe.md')
+
+    def test_root_files_are_found_regardless_of_case(self):
+        self.write('ReadMe.md', 'readme text')
+        self.write('Security.md', 'policy text')
+        self.write('Requirements.txt', 'flask')
+        self.write('App.CSPROJ', '<Project/>')
+        self.write('Docs/guide.md', 'guide text')
+
+        info = self.extractor.extract(self.repo_path)
+
+        self.assertEqual(info['readme'], 'readme text')
+        self.assertEqual(info['policies'], {'SECURITY.md': 'policy text'})
+        self.assertEqual(info['dependencies']['Requirements.txt'], {'language': 'python', 'content': 'flask'})
+        self.assertEqual(info['dependencies']['App.CSPROJ']['language'], 'dotnet')
+        self.assertEqual(info['documentation'], {'docs/guide.md': 'guide text'})
+
+    def test_file_reads_are_capped_in_bytes(self):
+        self.write('requirements.txt', 'é' * MAX_TEXT_BYTES)
+
+        content = self.extractor.extract(self.repo_path)['dependencies']['requirements.txt']['content']
+
+        self.assertLessEqual(len(content.encode('utf-8')), MAX_TEXT_BYTES)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+from app.services.report_service import _excerpt, _iter_paragraphs, _split_heading
+
+
+class IterParagraphsTest(unittest.TestCase):
+    def test_string_is_split_on_blank_lines(self):
+        text = '# Title\n\nFirst line\nsecond line\n\n\n\n  Last  \n'
+        self.assertEqual(list(_iter_paragraphs(text)), ['# Title', 'First line\nsecond line', 'Last'])
+
+    def test_chunks_split_mid_paragraph_and_mid_separator(self):
+        chunks = ['# Ti', 'tle\n', '\nBody', ' text\n\n', '', 'End']
+        self.assertEqual(list(_iter_paragraphs(chunks)), ['# Title', 'Body text', 'End'])
+
+    def test_empty_content_yields_nothing(self):
+        self.assertEqual(list(_iter_paragraphs('')), [])
+        self.assertEqual(list(_iter_paragraphs(['\n\n', '  '])), [])
+
+
+class SplitHeadingTest(unittest.TestCase):
+    def test_heading_levels(self):
+        self.assertEqual(_split_heading('# Title'), (1, 'Title'))
+        self.assertEqual(_split_heading('### Sub title '), (3, 'Sub title'))
+
+    def test_body_text(self):
+        self.assertEqual(_split_heading('Plain text'), (0, 'Plain text'))
+        self.assertEqual(_split_heading('#hashtag'), (0, '#hashtag'))
+        self.assertEqual(_split_heading('#'), (0, '#'))
+
+    def test_more_than_six_hashes_is_body_text(self):
+        self.assertEqual(_split_heading('####### Deep'), (0, '####### Deep'))
+
+
+class ExcerptTest(unittest.TestCase):
+    def test_short_text_is_stripped_only(self):
+        self.assertEqual(_excerpt('  short text \n', 20), 'short text')
+
+    def test_text_at_the_limit_is_not_marked(self):
+        self.assertEqual(_excerpt('abcde   ', 5), 'abcde')
+
+    def test_long_text_is_cut_and_marked(self):
+        self.assertEqual(_excerpt(' abcdefgh', 5), 'abcde...')
+
+
+if __name__ == '__main__':
+    unittest.main()